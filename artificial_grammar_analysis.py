@@ -23,92 +23,222 @@
                   - Average accuracy per trial
                   - Reaction time distributions
              4. Output: Saves processed data, visualizations, and summary statistics for further reporting or publication.
+                - The visualizations are saved as PNG files in a folder named 'plots'.
 
              Prerequisites:
              - All participant data must be stored in a folder named 'data' with separate subfolders for training and test phase results.
-             - Required Python libraries: pandas, matplotlib, seaborn.
+             - The phase results are read from the parquet files, or from the CSV files for data saved without parquet files.
+             - Required Python libraries: pandas, pyarrow, matplotlib, seaborn.
 
 """
 # %% IMPORT NECESSARY MODULES
 import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # Non-interactive backend, the plots are saved to files instead of shown
 import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
 import seaborn as sns
 
-# %% LOAD DATA
-# Initialize empty DataFrames for storing combined data
-all_training_data = pd.DataFrame()
-all_test_data = pd.DataFrame()
+# %% FUNCTIONS - to be used on the main code later
+def find_phase_files(phase):
+    """
+    Finds the result file of the given phase in every participant folder.
+    Parquet files are preferred, CSV files are used for participants without a parquet file.
+
+    Parameters
+    ----------
+    phase : str
+        Name of the phase, "training_phase" or "test_phase".
+
+    Returns
+    -------
+    phase_file_paths : list of pathlib.Path
+        One result file per participant folder, sorted by folder name.
+
+    """
+    csv_paths = {path.parent: path for path in Path(base_dir).rglob(f"*_{phase}.csv")}
+    parquet_paths = {path.parent: path for path in Path(base_dir).rglob(f"*_{phase}.parquet")}
+    # Sort by folder name so the participants always come out in ID order, whatever order the filesystem returns
+    phase_file_paths = sorted({**csv_paths, **parquet_paths}.values(), key=lambda path: path.parent.name)
+    return phase_file_paths
+
+def load_phase_data(file_path):
+    """
+    Reads a single phase result file and tags it with the participant ID.
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        Path of a training or test phase parquet or CSV file inside a participant folder.
+
+    Returns
+    -------
+    phase_data : pd.DataFrame
+        The phase data with an added "Participant_ID" column, based on the folder name.
+
+    """
+    # Declare the column types upfront so the reader does not need to infer them
+    # accuracy and block are small integers and RT fits in single precision, which halves the memory per column
+    column_dtypes = {
+        "block": "int8",
+        "accuracy": "int8",
+        "RT": "float32",
+        "stimulus": "string[pyarrow]",
+        "participant response": "string[pyarrow]",
+        "key_pressed": "string[pyarrow]",
+        "correct_key": "string[pyarrow]",
+    }
+    if file_path.suffix == ".parquet":
+        phase_data = pd.read_parquet(file_path, engine="pyarrow")
+        phase_data = phase_data.astype({column: dtype for column, dtype in column_dtypes.items() if column in phase_data.columns})
+    else:
+        phase_data = pd.read_csv(file_path, engine="pyarrow", dtype=column_dtypes)
+    phase_data["Participant_ID"] = file_path.parent.name
+    return phase_data
+
+def correct_rt(phase_data):
+    """
+    Returns the reaction times of the correct responses, without copying the rest of the data.
+
+    Parameters
+    ----------
+    phase_data : pd.DataFrame
+        Training or test phase data with "accuracy" and "RT" columns.
+
+    Returns
+    -------
+    rt_correct : pd.Series
+        The "RT" column, with the reaction times of incorrect responses set to NaN
+        so that they are skipped by mean().
+
+    """
+    rt_correct = phase_data["RT"].where(phase_data["accuracy"].eq(np.int8(1)))
+    return rt_correct
+
+def summarize_phase(phase_data):
+    """
+    Computes the accuracy and the reaction time of correct responses for every participant in one pass.
+
+    Parameters
+    ----------
+    phase_data : pd.DataFrame
+        Combined training or test phase data of all participants.
+
+    Returns
+    -------
+    phase_summary : pd.DataFrame
+        One row per participant, with the mean "accuracy", the mean "rt_correct"
+        (reaction time of the correct responses only) and the number of "trials".
+
+    """
+    phase_summary = (
+        pd.DataFrame({"accuracy": phase_data["accuracy"], "rt_correct": correct_rt(phase_data)})
+        .groupby(phase_data["Participant_ID"], sort=False, observed=True)
+        .agg(accuracy=("accuracy", "mean"), rt_correct=("rt_correct", "mean"), trials=("accuracy", "size"))
+    )
+    return phase_summary
 
+def save_plot(name):
+    """
+    Saves the current figure as a PNG file in the plots folder and closes it.
+
+    Parameters
+    ----------
+    name : str
+        File name of the plot, without extension.
+
+    Returns
+    -------
+    None.
+
+    """
+    plt.savefig(os.path.join(plots_dir, f"{name}.png"), dpi=100, bbox_inches="tight")
+    plt.close()
+
+# %% LOAD DATA
 # Base directory where participant folders are stored
 base_dir = "data"
 
-# Walk through the directory and gather training and test data
-for root, dirs, files in os.walk(base_dir):
-    for file in files:
-        if file.endswith("_training_phase.csv"):
-            training_file_path = os.path.join(root, file)
-            training_data = pd.read_csv(training_file_path)
-            
-            # Add participant ID based on folder name
-            participant_id = os.path.basename(root)
-            training_data["Participant_ID"] = participant_id
-            
-            all_training_data = pd.concat([all_training_data, training_data], ignore_index=True)
-
-        elif file.endswith("_test_phase.csv"):
-            test_file_path = os.path.join(root, file)
-            test_data = pd.read_csv(test_file_path)
-            
-            # Add participant ID based on folder name
-            participant_id = os.path.basename(root)
-            test_data["Participant_ID"] = participant_id
-            
-            all_test_data = pd.concat([all_test_data, test_data], ignore_index=True)
+# Output directory where the plots are saved
+plots_dir = "plots"
+os.makedirs(plots_dir, exist_ok=True)
+
+# Gather training and test data from every participant folder
+training_file_paths = find_phase_files("training_phase")
+test_file_paths = find_phase_files("test_phase")
+
+# Read the files concurrently, as reading the files is mostly waiting on the disk
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    training_frames = list(executor.map(load_phase_data, training_file_paths))
+    test_frames = list(executor.map(load_phase_data, test_file_paths))
+
+# Combine all participants' data into a single DataFrame per phase
+all_training_data = pd.concat(training_frames, ignore_index=True, copy=False)
+all_test_data = pd.concat(test_frames, ignore_index=True, copy=False)
+
+# Store the participant IDs as categories so grouping works on integer codes instead of strings
+all_training_data["Participant_ID"] = all_training_data["Participant_ID"].astype("category")
+all_test_data["Participant_ID"] = all_test_data["Participant_ID"].astype("category")
+
+# Number the trials of each participant from 0, to be used as x-axis of the plots
+all_training_data["trial"] = all_training_data.groupby("Participant_ID", sort=False, observed=True).cumcount()
+all_test_data["trial"] = all_test_data.groupby("Participant_ID", sort=False, observed=True).cumcount()
 
 # %% INDIVIDUAL-LEVEL ANALYSIS
-# Analyze each participant's performance in training and test phases
-for participant_id in all_training_data["Participant_ID"].unique():
-    participant_training_data = all_training_data[all_training_data["Participant_ID"] == participant_id]
-    participant_test_data = all_test_data[all_test_data["Participant_ID"] == participant_id]
-    
+# Summarize accuracy and reaction times of all participants at once
+training_summary = summarize_phase(all_training_data)
+test_summary = summarize_phase(all_test_data)
+individual_test_summary = test_summary.reindex(training_summary.index)
+
+# Print each participant's performance in training and test phases
+for participant_id in training_summary.index:
     # Training Phase: Accuracy and Reaction Time
-    training_accuracy = participant_training_data["accuracy"].mean() * 100
-    training_rt_correct = participant_training_data[participant_training_data["accuracy"] == 1]["RT"].mean()
+    training_accuracy = training_summary.at[participant_id, "accuracy"] * 100
+    training_rt_correct = training_summary.at[participant_id, "rt_correct"]
     print(f"Participant {participant_id} Training Phase Accuracy: {training_accuracy:.2f}%")
     print(f"Participant {participant_id} Training Phase RT (Correct): {training_rt_correct:.2f} seconds")
     
     # Test Phase: Accuracy and Reaction Time
-    test_accuracy = participant_test_data["accuracy"].mean() * 100
-    test_rt_correct = participant_test_data[participant_test_data["accuracy"] == 1]["RT"].mean()
+    test_accuracy = individual_test_summary.at[participant_id, "accuracy"] * 100
+    test_rt_correct = individual_test_summary.at[participant_id, "rt_correct"]
     print(f"Participant {participant_id} Test Phase Accuracy: {test_accuracy:.2f}%")
     print(f"Participant {participant_id} Test Phase RT (Correct): {test_rt_correct:.2f} seconds")
-    
-    # Plot Individual Training Phase Reaction Times
-    sns.lineplot(data=participant_training_data, x=participant_training_data.index, y="RT", label="Training RT")
-    plt.title(f"Participant {participant_id} Training Reaction Times")
-    plt.ylabel("Reaction Time (s)")
-    plt.xlabel("Trial")
-    plt.legend()
-    plt.show()
-    
-    # Plot Individual Test Phase Accuracy
-    # Create a DataFrame for plotting
-    test_accuracy_df = participant_test_data.reset_index()
-    sns.barplot(data=test_accuracy_df, x="index", y="accuracy", ci=None)
-    plt.title(f"Participant {participant_id} Test Accuracy")
-    plt.ylabel("Accuracy")
-    plt.xlabel("Trial")
-    plt.show()
+
+# Plot Individual Training Phase Reaction Times, one panel per participant in a single figure
+individual_training_plot = sns.relplot(
+    data=all_training_data,
+    x="trial", y="RT", col="Participant_ID", col_wrap=4, kind="line", height=3, aspect=1.5
+)
+individual_training_plot.set_titles("{col_name}")
+individual_training_plot.set_axis_labels("Trial", "Reaction Time (s)")
+individual_training_plot.figure.suptitle("Training Reaction Times per Participant", y=1.02)
+save_plot("individual_training_rt")
+
+# Plot Individual Test Phase Accuracy, one panel per participant in a single figure
+individual_test_plot = sns.catplot(
+    data=all_test_data,
+    x="trial", y="accuracy", col="Participant_ID", col_wrap=4, kind="bar", height=3, aspect=1.5, errorbar=None
+)
+individual_test_plot.set_titles("{col_name}")
+individual_test_plot.set_axis_labels("Trial", "Accuracy")
+individual_test_plot.figure.suptitle("Test Accuracy per Participant", y=1.02)
+# Show only a few trial ticks per panel, as there is one bar per trial
+for ax in individual_test_plot.axes.flat:
+    ax.xaxis.set_major_locator(MaxNLocator(10))
+save_plot("individual_test_accuracy")
 
 # %% GROUP-LEVEL ANALYSIS
 # Training Phase: Group-Level Accuracy and Reaction Time
-group_training_accuracy = all_training_data.groupby("Participant_ID")["accuracy"].mean() * 100
-group_training_rt_correct = all_training_data[all_training_data["accuracy"] == 1].groupby("Participant_ID")["RT"].mean()
+group_training_accuracy = training_summary["accuracy"] * 100
+group_training_rt_correct = training_summary["rt_correct"]
 
 # Test Phase: Group-Level Accuracy and Reaction Time
-group_test_accuracy = all_test_data.groupby("Participant_ID")["accuracy"].mean() * 100
-group_test_rt_correct = all_test_data[all_test_data["accuracy"] == 1].groupby("Participant_ID")["RT"].mean()
+group_test_accuracy = test_summary["accuracy"] * 100
+group_test_rt_correct = test_summary["rt_correct"]
 
 # Group-Level Summary
 print("Group-Level Training Phase Accuracy:\n", group_training_accuracy)
@@ -118,33 +248,36 @@ print("Group-Level Test Phase RT (Correct):\n", group_test_rt_correct)
 
 # Group-Level Plots
 # Accuracy Across Phases for All Participants
-sns.barplot(x=group_training_accuracy.index, y=group_training_accuracy.values)
+# The values are already one mean per participant, so plot them directly without seaborn's estimation
+plt.bar(group_training_accuracy.index.astype(str), group_training_accuracy.to_numpy())
 plt.title("Group Training Phase Accuracy Rate")
 plt.ylabel("Accuracy (%)")
 plt.xlabel("Participant")
-plt.show()
+save_plot("group_training_accuracy")
 
-sns.barplot(x=group_test_accuracy.index, y=group_test_accuracy.values)
+plt.bar(group_test_accuracy.index.astype(str), group_test_accuracy.to_numpy())
 plt.title("Group Test Phase Accuracy Rate")
 plt.ylabel("Accuracy (%)")
 plt.xlabel("Participant")
-plt.show()
+save_plot("group_test_accuracy")
 
 # Reaction Times Across Phases for All Participants
-sns.lineplot(data=all_training_data, x=all_training_data.index, y="RT", label="Training RT")
-sns.lineplot(data=all_test_data, x=all_test_data.index, y="RT", label="Test RT")
+# Each line is the mean RT per trial number across participants, drawn without seaborn's bootstrapped error band
+sns.lineplot(data=all_training_data, x="trial", y="RT", label="Training RT", errorbar=None)
+sns.lineplot(data=all_test_data, x="trial", y="RT", label="Test RT", errorbar=None)
 plt.title("Reaction Times Across Phases (All Participants)")
 plt.ylabel("Reaction Time (s)")
 plt.xlabel("Trial")
 plt.legend()
-plt.show()
+save_plot("group_reaction_times")
 
 # %% OVERALL AVERAGES
 # Calculate overall averages for training and test phases
-overall_training_accuracy = all_training_data["accuracy"].mean() * 100
+# The accuracy is the participant accuracies weighted by their number of trials, which equals the mean over all trials
+overall_training_accuracy = np.average(training_summary["accuracy"], weights=training_summary["trials"]) * 100
 overall_training_rt = all_training_data["RT"].mean()
 
-overall_test_accuracy = all_test_data["accuracy"].mean() * 100
+overall_test_accuracy = np.average(test_summary["accuracy"], weights=test_summary["trials"]) * 100
 overall_test_rt = all_test_data["RT"].mean()
 
 # Print overall results
@@ -163,9 +296,9 @@ overall_summary = pd.DataFrame({
 })
 
 # Plot overall averages
-sns.barplot(data=overall_summary, x="Phase", y="Value", hue="Metric")
+sns.barplot(data=overall_summary, x="Phase", y="Value", hue="Metric", errorbar=None)
 plt.title("Overall Averages for Accuracy and Reaction Times")
 plt.ylabel("Value")
 plt.xlabel("Phase")
 plt.legend(title="Metric")
-plt.show()
+save_plot("overall_averages")
@@ -26,6 +26,7 @@
              - **Participant information results**: Includes experiment type and participants' ID, gender, age, native language.
              - **Training phase results**: Includes accuracy, response times, and trial-level feedback.
              - **Test phase results**: Includes accuracy, response times, and classification decisions for each word.
+             The phase results are saved as parquet files, and optionally as csv files as well (see save_csv in the project settings).
 
              Data analysis can be conducted using the accompanying analysis file, located in the same folder.
 
@@ -37,13 +38,18 @@
 
 #import the submodules from psychopy
 from psychopy import visual, core, event, gui
-import random, os, time
+from psychopy.hardware import keyboard
+import os, time, csv
+from collections import namedtuple
+import numpy as np
 import pandas as pd
 
 # %% PROJECT SETTINGS
 
 full = True #modify this to determine showing the experiment as full screen or not. Set True if you would like to run the experiment on full screen.
 
+save_csv = True #modify this to determine also saving the phase results as csv files, written after every trial. The results are always saved as parquet files at the end of each phase.
+
 #get the current timestamp
 timestamp = time.strftime("%Y%m%d")
 
@@ -94,6 +100,21 @@ else:
 #create a new folder with the participant ID and timestamp
 participant_folder = os.path.join("data", f"{participant_info['ID']}_{timestamp}")
 os.makedirs(participant_folder, exist_ok=True)
+
+#paths of the phase result files
+training_parquet_path = os.path.join(participant_folder, f'{participant_info["ID"]}_training_phase.parquet')
+test_parquet_path = os.path.join(participant_folder, f'{participant_info["ID"]}_test_phase.parquet')
+training_csv_path = os.path.join(participant_folder, f'{participant_info["ID"]}_training_phase.csv')
+test_csv_path = os.path.join(participant_folder, f'{participant_info["ID"]}_test_phase.csv')
+
+#remove the phase results left by an earlier run with the same ID on the same day, so they are not mixed with this run's results
+stale_paths = [training_parquet_path, test_parquet_path]
+if save_csv:
+    stale_paths += [training_csv_path, test_csv_path]
+for stale_path in stale_paths:
+    if os.path.exists(stale_path):
+        os.remove(stale_path)
+
 #store the personal information
 participant_info_df = pd.DataFrame([participant_info])
 participant_info_df.to_csv(os.path.join(participant_folder, f'{participant_info["ID"]}_participant_info.csv'), index=False)
@@ -103,7 +124,8 @@ participant_info_df.to_csv(os.path.join(participant_folder, f'{participant_info[
 #create a function to display the texts
 def display_text(enter_text):
     """
-    Creates and returns a PsychoPy TextStim object to display the given text on the screen.
+    Displays the given text on the screen, using the shared PsychoPy TextStim object.
+    Only the text of the stimulus is changed, so no new TextStim is created on every call.
 
     Parameters
     ----------
@@ -112,38 +134,32 @@ def display_text(enter_text):
 
     Returns
     -------
-    demonstrate : visual.TextStim
-        A TextStim object that can be drawn to the window.
+    None.
 
     """
-    text_height = 40 #adjust the value according to the computer screen
-    wrap_width = 1200 #adjust the value according to the computer screen
-    demonstrate = visual.TextStim(
-        win,
-        text = enter_text,
-        color = "black",
-        height = text_height,
-        wrapWidth = wrap_width
-    )
-    demonstrate.draw()
+    text_stim.text = enter_text
+    text_stim.draw()
     win.flip()
 
 # %% INITIALISATION
 
 #import stimuli for training phase
 with open ('training_phase.txt') as file:
-    content_training_phase = file.readlines()
+    content_training_phase = file.read()
     
-#store the training stimuli in a list
-training_stimuli_list = [letter_string.strip() for letter_string in content_training_phase]
+#store the training stimuli in a tuple, skipping empty lines
+#the stimuli are not shuffled themselves, each block iterates them in a new random order of their indices
+training_stimuli = tuple(letter_string for letter_string in (line.strip() for line in content_training_phase.splitlines()) if letter_string)
 
 #load the text file of test phase stimuli into a DataFrame
 #rationale of using DataFrame for this step unlike trial phase is stimuli file of test phase includes grammar rule per stimulus and we would like to store this information and use on later steps.
 test_stimuli_df = pd.read_csv(
     'test_phase.txt',
-    delim_whitespace = True,
+    sep = r"\s+",
+    engine = "c",
     header = None,
-    names = ['test stimulus', 'grammar rule']
+    names = ['test stimulus', 'grammar rule'],
+    dtype = {'test stimulus': 'string', 'grammar rule': 'int8'}
     )
 #shuffle the test stimuli DataFrame rows
 test_stimuli_df = test_stimuli_df.sample(frac = 1, ignore_index=True)
@@ -158,91 +174,132 @@ with open('Test_Phase_Instructions.txt', 'r') as file:
 #create a window
 win = visual.Window(fullscr = full, color= "white", units = 'pix' )
 
+#create the text stimulus once, display_text only updates its text
+text_height = 40 #adjust the value according to the computer screen
+wrap_width = 1200 #adjust the value according to the computer screen
+text_stim = visual.TextStim(
+    win,
+    text = "",
+    color = "black",
+    height = text_height,
+    wrapWidth = wrap_width
+)
+
 #create an empty list to collect participants' results
 results_training_phase = []
 results_test_phase = []
 
+#each trial is stored as a small named tuple instead of a dictionary
+#the column names of the csv files are kept separately, as "participant response" is not a valid field name
+TrainingRow = namedtuple("TrainingRow", "block stimulus participant_response accuracy RT")
+TestRow = namedtuple("TestRow", "stimulus grammar_rule key_pressed correct_key accuracy RT")
+training_columns = ["block", "stimulus", "participant response", "accuracy", "RT"]
+test_columns = list(TestRow._fields)
+
 #initialise the clock
 clock = core.Clock()
 
+#initialise the keyboard, it timestamps the key presses itself so the RTs do not depend on how often we poll it
+kb = keyboard.Keyboard()
+
 # %% TRAINING PHASE
 
 #display instructions training phase
 display_text(training_phase_instructions)
 event.waitKeys(keyList=["space"])
 
-#Make the excercise go twice
-for block in range(1,3):
-    random.shuffle(training_stimuli_list)
-    
-    #presenting word and evaluate reproduction of participant
-    for training_stimulus in training_stimuli_list:
-        
-        #reset value to start again with a stimulus
-        repeat = True
-        
-        #repeat when participant was wrong
-        while repeat:
-           
-           #show the stimulus word for 4 seconds 
-            display_text("")
-            display_text(training_stimulus)
-            core.wait(4)
+#open the csv result file once, each trial is appended as a single row instead of rewriting the whole file
+if save_csv:
+    training_file = open(training_csv_path, 'w', newline='')
+    training_writer = csv.writer(training_file)
+    training_writer.writerow(training_columns)
+
+try:
+    #Make the excercise go twice
+    for block in range(1,3):
+        training_order = np.random.permutation(len(training_stimuli))
         
-            #resetting values
-            trial=[]
-            participant_response = ''
-            response = True
-            
-            accuracy = 0
-            RT = None         
+        #presenting word and evaluate reproduction of participant
+        for stimulus_index in training_order:
+            training_stimulus = training_stimuli[stimulus_index]
             
-            event.clearEvents()
-            clock.reset()
+            #reset value to start again with a stimulus
+            repeat = True
             
-            #register pressed keys and time for RT
-            while response == True:
-                keys = event.getKeys(timeStamped = clock)
+            #repeat when participant was wrong
+            while repeat:
+               
+               #show the stimulus word for 4 seconds 
+                display_text("")
+                display_text(training_stimulus)
+                core.wait(4)
             
-                #evaluate when special keys, to keep their function, registrate RT 
-                for key, time_ in keys:
-                    if key == 'return':
-                        RT = time_
-                        response = False
-                    elif key == 'backspace':
-                        if trial:
-                            trial.pop()
-                            
-                    #add typed letters to the list in uppercase
-                    elif len(key) == 1:  
-                        trial.append(key.upper())
-                        
-                #make a string of the list and display
-                participant_response = ''.join(trial)
-                display_text(participant_response)
-    
-            #evaluate if participant was correct, if so go to next word
-            if training_stimulus == participant_response.strip():
-                accuracy = 1
-                repeat = False
-            else:   #participant is not correct, show feedback and show the word again
+                #resetting values
+                participant_response = ''
+                response = True
+                
                 accuracy = 0
-                display_text("INCORRECT!\n\nPLEASE TRY AGAIN.")
-                core.wait(2)               
-            
-            #store the necessary data
-            results_training_phase.append({
-                "block": block,
-                "stimulus": training_stimulus,
-                "participant response": participant_response,
-                "accuracy": accuracy,
-                "RT": RT        
-            })
-            
-            #create a csv file to store reaction time and accuray of responses
-            training_df = pd.DataFrame(results_training_phase)
-            training_df.to_csv(os.path.join(participant_folder, f'{participant_info["ID"]}_training_phase.csv'), index=False)
-            
+                RT = None         
+                
+                event.clearEvents()
+                kb.clearEvents()
+                kb.clock.reset()
+                
+                #the screen is only redrawn when the typed response changed
+                dirty = True
+                
+                #register pressed keys and time for RT
+                while response == True:
+                    keys = kb.getKeys(waitRelease = False)
+                
+                    #evaluate when special keys, to keep their function, registrate RT 
+                    for key in keys:
+                        if key.name == 'return':
+                            RT = key.rt
+                            response = False
+                        elif key.name == 'backspace':
+                            if participant_response:
+                                participant_response = participant_response[:-1]
+                                dirty = True
+                                
+                        #add typed letters to the response in uppercase
+                        elif len(key.name) == 1:  
+                            participant_response += key.name.upper()
+                            dirty = True
+                            
+                    #display the response when it changed
+                    if dirty:
+                        display_text(participant_response)
+                        dirty = False
+                    else:
+                        #nothing changed, wait shortly instead of busy polling the keyboard
+                        core.wait(0.01, hogCPUperiod = 0)
+        
+                #evaluate if participant was correct, if so go to next word
+                if training_stimulus == participant_response.strip():
+                    accuracy = 1
+                    repeat = False
+                else:   #participant is not correct, show feedback and show the word again
+                    accuracy = 0
+                    display_text("INCORRECT!\n\nPLEASE TRY AGAIN.")
+                    core.wait(2)               
+                
+                #store the necessary data
+                results_training_phase.append(TrainingRow(block, training_stimulus, participant_response, accuracy, RT))
+                
+                #write the trial to the csv file right away, so the data is kept if the experiment stops early
+                if save_csv:
+                    training_writer.writerow(results_training_phase[-1])
+                    training_file.flush()
+finally:
+    #close the csv file of the training phase, also when the experiment stops early
+    if save_csv:
+        training_file.close()
+
+#create a parquet file to store reaction time and accuracy of responses
+training_df = pd.DataFrame.from_records(results_training_phase, columns=training_columns)
+training_df.to_parquet(training_parquet_path, engine="pyarrow", index=False)
+
 #end phrase of the training phase
 display_text("The training phase is complete.\nPlease press the SPACE BAR when you are ready to proceed to the next part of the experiment.")
 event.waitKeys(keyList=["space"])
@@ -255,55 +312,60 @@ event.waitKeys(keyList=["space"])
 
 key_options = ["J","F"] 
 
-#iterate through each stimulus in the DataFrame
-for index, row in test_stimuli_df.iterrows():
-    test_stimulus = row["test stimulus"]
-    grammar_rule = row["grammar rule"]
-    
-    #display stimulus
-    display_text(test_stimulus)
-    
-    #start the clock to track the time for max 6 seconds
-    clock.reset()
-    
-    #set default values for reaction time, pressed key and accuracy
-    key_pressed = None
-    RT = None
-    accuracy = 0
-    
-    #accept only J or F key responses
-    #wait for a key response at most for 6 seconds
-    key_response = event.waitKeys(keyList = key_options + [k.lower() for k in key_options], maxWait = 6, timeStamped = clock)
+#accepted keys in both upper and lower case, and the correct key per grammar rule (0: J, 1: F)
+accepted_keys = key_options + [k.lower() for k in key_options]
+correct_keys = {0: key_options[0], 1: key_options[1]}
+
+#open the csv result file once, only now that the test phase starts
+if save_csv:
+    test_file = open(test_csv_path, 'w', newline='')
+    test_writer = csv.writer(test_file)
+    test_writer.writerow(test_columns)
+
+#iterate through each stimulus and its grammar rule as plain values, without building a row per trial
+test_stimuli = test_stimuli_df["test stimulus"].to_numpy()
+grammar_rules = test_stimuli_df["grammar rule"].to_numpy()
+try:
+    for test_stimulus, grammar_rule in zip(test_stimuli, grammar_rules):
+        correct_key = correct_keys[grammar_rule]
+        
+        #display stimulus
+        display_text(test_stimulus)
+        
+        #start the clock to track the time for max 6 seconds
+        clock.reset()
+        
+        #set default values for reaction time, pressed key and accuracy
+        key_pressed = None
+        RT = None
+        accuracy = 0
+        
+        #accept only J or F key responses
+        #wait for a key response at most for 6 seconds
+        key_response = event.waitKeys(keyList = accepted_keys, maxWait = 6, timeStamped = clock)
 
-    #collect the accuracy of the key response and reaction time (RT)    
-    if grammar_rule == 0:
-        correct_key = key_options[0]
+        #collect the accuracy of the key response and reaction time (RT)    
         if key_response:
             key_pressed, RT = key_response[0]
             key_pressed = key_pressed.upper()
-            if key_pressed == key_options[0]:
-                accuracy = 1   
-    else:
-        correct_key = key_options[1]
-        if key_response:
-            key_pressed, RT = key_response[0]
-            key_pressed = key_pressed.upper()
-            if key_pressed == key_options[1]:
-                accuracy = 1
-    
-    #store the necessary data
-    results_test_phase.append({
-        "stimulus": test_stimulus,
-        "grammar_rule": grammar_rule,
-        "key_pressed": key_pressed,
-        "correct_key": correct_key,
-        "accuracy": accuracy,
-        "RT": RT        
-    })
-
-#create a csv file to store reaction time and accuray of responses
-test_df = pd.DataFrame(results_test_phase)
-test_df.to_csv(os.path.join(participant_folder, f'{participant_info["ID"]}_test_phase.csv'), index=False)
+            accuracy = int(key_pressed == correct_key)
+        
+        #store the necessary data
+        results_test_phase.append(TestRow(test_stimulus, grammar_rule, key_pressed, correct_key, accuracy, RT))
+        
+        #write the trial to the csv file right away, so the data is kept if the experiment stops early
+        if save_csv:
+            test_writer.writerow(results_test_phase[-1])
+            test_file.flush()
+finally:
+    #close the csv file of the test phase, also when the experiment stops early
+    if save_csv:
+        test_file.close()
+
+#create a parquet file to store reaction time and accuracy of responses
+#RT is set as float explicitly, in case no key was pressed in any trial
+test_df = pd.DataFrame.from_records(results_test_phase, columns=test_columns).astype({"RT": "float64"})
+test_df.to_parquet(test_parquet_path, engine="pyarrow", index=False)
 
 # %% END OF THE EXPERIMENT
 